@@ -6,44 +6,146 @@ API Docs: https://www.imagetyperz.com/Forms/api/api.html
 Additional docs: https://github.com/imagetyperz-api/API-docs
 """
 import asyncio
+import importlib.util
+import io
+import mmap
+import time
 from base64 import b64encode
-from datetime import datetime
-from typing import BinaryIO, Optional, Union
+from typing import Any, BinaryIO, Dict, Optional, Union
+from urllib.parse import quote_plus, urlencode
 
 import httpx
 from httpx._types import TimeoutTypes
 
-from .auth import TokenDataAuth
 from .constants import reCAPTCHAType
 from .exceptions import (raise_on_error, ImageTimedOut, NotDecoded,
                          ImageTyperzError, LimitExceeded, MaximumAttemptsReached)
-from .util.logging import getLogger, ClassLoggingProperty
+from .util.logging import getLogger, LoggerMixin
 
 logger = getLogger(__name__)
 
-
-class ImageTyperzClient:
+###
+# All endpoints live on a single host, and complete_recaptcha() may be polled
+# from many tasks at once — so we allow far more pooled connections than the
+# httpx defaults (100 total, 20 keep-alive), and keep idle ones around longer.
+#
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=1000,
+    max_keepalive_connections=100,
+    keepalive_expiry=30.0,
+)
+
+
+def _b64encode_file(file: BinaryIO) -> str:
+    """Base64-encode the remaining contents of a file-like object
+
+    If the file is backed by a file descriptor, its contents are memory-mapped
+    and encoded directly, instead of first being read into a bytes object.
+    """
+    try:
+        offset = file.tell()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view, \
+                view[offset:] as remaining:
+            encoded = b64encode(remaining)
+    except (AttributeError, OSError, ValueError):
+        # Not backed by a (non-empty, mappable) file, e.g. an io.BytesIO
+        encoded = b64encode(file.read())
+    else:
+        # Leave the file position where file.read() would have
+        file.seek(0, io.SEEK_END)
+
+    return encoded.decode('ascii')
+
+
+def _response_text(response: httpx.Response) -> str:
+    """Decode the body of an API response
+
+    API responses are short, plain strings, so we decode them directly,
+    rather than going through httpx's charset detection in Response.text
+    """
+    return response.content.decode('utf-8', 'replace')
+
+
+###
+# API endpoints. Methods reference these module globals directly, rather than
+# through the ImageTyperzClient.Endpoints namespace.
+#
+_EP_CAPTCHA_CONTENT = 'https://captchatypers.com/Forms/UploadFileAndGetTextNEWToken.ashx'
+_EP_CAPTCHA_URL = 'https://captchatypers.com/Forms/FileUploadAndGetTextCaptchaURLToken.ashx'
+_EP_RECAPTCHA_SUBMIT = 'https://captchatypers.com/captchaapi/UploadRecaptchaToken.ashx'
+_EP_RECAPTCHA_RETRIEVE = 'https://captchatypers.com/captchaapi/GetRecaptchaTextToken.ashx'
+_EP_BALANCE = 'https://captchatypers.com/Forms/RequestBalanceToken.ashx'
+_EP_BAD_IMAGE = 'https://captchatypers.com/Forms/SetBadImageToken.ashx'
+_EP_PROXY_CHECK = 'https://captchatypers.com/captchaAPI/GetReCaptchaTextTokenJSON.ashx'
+_EP_GEETEST_SUBMIT = 'https://captchatypers.com/captchaapi/UploadGeeTestToken.ashx'
+
+###
+# Pre-encoded form bodies for the requests whose shape never changes, sparing
+# httpx from urlencoding them on each call.
+#
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+_BALANCE_BODY = b'action=REQUESTBALANCE'
+_RECAPTCHA_RETRIEVE_BODY = b'action=GETTEXT&captchaid=%s'
+
+###
+# complete_recaptcha() first checks for results after this many seconds, then
+# backs off by POLL_BACKOFF_FACTOR each time, up to its poll_interval. This
+# way, jobs solved quickly aren't left waiting a full poll_interval.
+#
+INITIAL_POLL_INTERVAL = 0.5
+POLL_BACKOFF_FACTOR = 1.5
+
+
+class ImageTyperzClient(LoggerMixin):
     session: httpx.AsyncClient
-    log = ClassLoggingProperty(logger)
 
     _access_token: str
+    _base_data: Dict[str, str]
 
     _is_logged_in: bool
 
     class Endpoints:
-        CAPTCHA_CONTENT = 'http://captchatypers.com/Forms/UploadFileAndGetTextNEWToken.ashx'
-        CAPTCHA_URL = 'http://captchatypers.com/Forms/FileUploadAndGetTextCaptchaURLToken.ashx'
-        RECAPTCHA_SUBMIT = 'http://captchatypers.com/captchaapi/UploadRecaptchaToken.ashx'
-        RECAPTCHA_RETRIEVE = 'http://captchatypers.com/captchaapi/GetRecaptchaTextToken.ashx'
-        BALANCE = 'http://captchatypers.com/Forms/RequestBalanceToken.ashx'
-        BAD_IMAGE = 'http://captchatypers.com/Forms/SetBadImageToken.ashx'
-        PROXY_CHECK = 'http://captchatypers.com/captchaAPI/GetReCaptchaTextTokenJSON.ashx'
-        GEETEST_SUBMIT = 'http://captchatypers.com/captchaapi/UploadGeeTestToken.ashx'
-
-    def __init__(self, access_token, *, timeout: TimeoutTypes = 60.0):
+        CAPTCHA_CONTENT = _EP_CAPTCHA_CONTENT
+        CAPTCHA_URL = _EP_CAPTCHA_URL
+        RECAPTCHA_SUBMIT = _EP_RECAPTCHA_SUBMIT
+        RECAPTCHA_RETRIEVE = _EP_RECAPTCHA_RETRIEVE
+        BALANCE = _EP_BALANCE
+        BAD_IMAGE = _EP_BAD_IMAGE
+        PROXY_CHECK = _EP_PROXY_CHECK
+        GEETEST_SUBMIT = _EP_GEETEST_SUBMIT
+
+    def __init__(
+        self,
+        access_token,
+        *,
+        timeout: TimeoutTypes = 60.0,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        http2: Optional[bool] = None,
+    ):
         self._access_token = access_token
 
-        self.session = httpx.AsyncClient(auth=TokenDataAuth(self._access_token), timeout=timeout)
+        ###
+        # HTTP/2 lets concurrent requests share a single connection, but
+        # requires the optional h2 package (installed by httpx[http2]). Unless
+        # explicitly requested or refused, we use it whenever it's available.
+        #
+        if http2 is None:
+            http2 = importlib.util.find_spec('h2') is not None
+
+        ###
+        # The access token is passed in the POST body of every request. Since
+        # it never changes, we merge it into each request's form data, rather
+        # than rewriting the encoded body of each outgoing request.
+        #
+        self._base_data = {'token': access_token}
+        self._token_suffix = b'&' + urlencode(self._base_data).encode()
+
+        self.session = httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits,
+            http2=http2,
+        )
 
     async def __aenter__(self):
         await self.session.__aenter__()
@@ -56,6 +158,12 @@ class ImageTyperzClient:
         """Close the httpx client session"""
         await self.session.aclose()
 
+    async def _post(self, url: str, data: Dict[str, Any]) -> httpx.Response:
+        return await self.session.post(url, data={**self._base_data, **data})
+
+    async def _post_encoded(self, url: str, body: bytes) -> httpx.Response:
+        return await self.session.post(url, content=body + self._token_suffix, headers=_FORM_HEADERS)
+
     def _raise_on_error(self, response: httpx.Response, msg: str, *format_args,
                         no_log_exceptions=(ImageTimedOut, NotDecoded)):
         try:
@@ -73,13 +181,10 @@ class ImageTyperzClient:
             in USD.
 
         """
-        data = {
-            'action': 'REQUESTBALANCE',
-        }
-        res = await self.session.post(self.Endpoints.BALANCE, data=data)
+        res = await self._post_encoded(_EP_BALANCE, _BALANCE_BODY)
         self._raise_on_error(res, 'Error retrieving account balance')
 
-        return float(res.text)
+        return float(_response_text(res))
 
     async def complete_image(
         self, *,
@@ -132,38 +237,45 @@ class ImageTyperzClient:
         if is_digits_only and is_letters_only:
             raise ValueError('Only one of is_digits_only or is_letters_only may be specified.')
 
-        image_data: Union[str, bytes]
+        image_data: str
         if image_url:
-            endpoint = self.Endpoints.CAPTCHA_URL
+            endpoint = _EP_CAPTCHA_URL
             image_data = image_url
         else:
-            endpoint = self.Endpoints.CAPTCHA_CONTENT
+            endpoint = _EP_CAPTCHA_CONTENT
             if file:
-                image_data = b64encode(file.read())
+                # Encoding a large image may take a while; don't block the loop
+                loop = asyncio.get_event_loop()
+                image_data = await loop.run_in_executor(None, _b64encode_file, file)
+            elif isinstance(b64_contents, bytes):
+                image_data = b64_contents.decode('ascii')
             else:
                 image_data = b64_contents
 
         data = {
             'action': 'UPLOADCAPTCHA',
             'file': image_data,
-            'iscase': is_case_sensitive or None,
-            'isphrase': is_phrase or None,
-            'ismath': is_math or None,
-            'alphanumeric': '1' if is_digits_only else '2' if is_letters_only else None,
-            'minlength': min_length,
-            'maxlength': max_length,
-        }
-        data = {
-            k: v
-            for k, v in data.items()
-            if v is not None
         }
+        if is_case_sensitive:
+            data['iscase'] = True
+        if is_phrase:
+            data['isphrase'] = True
+        if is_math:
+            data['ismath'] = True
+        if is_digits_only:
+            data['alphanumeric'] = '1'
+        elif is_letters_only:
+            data['alphanumeric'] = '2'
+        if min_length is not None:
+            data['minlength'] = min_length
+        if max_length is not None:
+            data['maxlength'] = max_length
 
         self.log.trace('Solving image CAPTCHA: %s', data)
-        res = await self.session.post(url=endpoint, data=data)
+        res = await self._post(endpoint, data)
         self._raise_on_error(res, 'Error solving image CAPTCHA')
 
-        captcha_id, answer = res.text.split('|', maxsplit=1)
+        captcha_id, answer = _response_text(res).split('|', maxsplit=1)
         return answer
 
     async def submit_recaptcha(
@@ -213,23 +325,24 @@ class ImageTyperzClient:
             'action': 'UPLOADCAPTCHA',
             'pageurl': page_url,
             'googlekey': site_key,
-            'useragent': user_agent,
-            'recaptchatype': recaptcha_type,
-            'captchaaction': recaptcha_action,
-            'score': recaptcha_min_score,
-            'data-s': data_s,
-        }
-        data = {
-            k: v
-            for k, v in data.items()
-            if v is not None
         }
+        if user_agent is not None:
+            data['useragent'] = user_agent
+        if recaptcha_type is not None:
+            # Pass a plain int, so httpx needn't dispatch to reCAPTCHAType.__str__
+            data['recaptchatype'] = int(recaptcha_type)
+        if recaptcha_action is not None:
+            data['captchaaction'] = recaptcha_action
+        if recaptcha_min_score is not None:
+            data['score'] = recaptcha_min_score
+        if data_s is not None:
+            data['data-s'] = data_s
 
         self.log.trace('Submitting reCAPTCHA job: %s', data)
-        res = await self.session.post(url=self.Endpoints.RECAPTCHA_SUBMIT, data=data)
+        res = await self._post(_EP_RECAPTCHA_SUBMIT, data)
         self._raise_on_error(res, 'Error submitting reCAPTCHA job')
 
-        job_id = res.text.strip()
+        job_id = _response_text(res).strip()
         self.log.debug('Successfully submitted reCAPTCHA job: %s', job_id)
         return job_id
 
@@ -244,16 +357,13 @@ class ImageTyperzClient:
             the captcha on the website.
 
         """
-        data = {
-            'action': 'GETTEXT',
-            'captchaid': job_id,
-        }
+        body = _RECAPTCHA_RETRIEVE_BODY % quote_plus(str(job_id)).encode()
 
-        self.log.trace('Retrieving reCAPTCHA job: %s', data)
-        res = await self.session.post(self.Endpoints.RECAPTCHA_RETRIEVE, data=data)
+        self.log.trace('Retrieving reCAPTCHA job: %s', job_id)
+        res = await self._post_encoded(_EP_RECAPTCHA_RETRIEVE, body)
         self._raise_on_error(res, 'Error retrieving reCAPTCHA job %s', job_id)
 
-        g_response = res.text
+        g_response = _response_text(res)
         self.log.debug('Retrieved reCAPTCHA job %s: %s', job_id, g_response)
         return g_response
 
@@ -305,44 +415,51 @@ class ImageTyperzClient:
             Maximum number of times to submit
 
         :param poll_interval:
-            Time to wait between checking for job results
+            Maximum time to wait between checking for job results. Results are
+            first checked for after INITIAL_POLL_INTERVAL seconds, with the wait
+            growing by POLL_BACKOFF_FACTOR each check, up to poll_interval.
 
         :return:
             The g-response of the completed captcha, which may be used to bypass
             the captcha on the website.
 
         """
-        start_at = datetime.utcnow()
+        start_at = time.monotonic()
+
+        submit_kwargs = dict(
+            page_url=page_url,
+            site_key=site_key,
+            user_agent=user_agent,
+            recaptcha_type=recaptcha_type,
+            recaptcha_action=recaptcha_action,
+            recaptcha_min_score=recaptcha_min_score,
+            data_s=data_s,
+        )
 
         for attempt in range(max_attempts):
-            job_id = await self.submit_recaptcha(
-                page_url=page_url,
-                site_key=site_key,
-                user_agent=user_agent,
-                recaptcha_type=recaptcha_type,
-                recaptcha_action=recaptcha_action,
-                recaptcha_min_score=recaptcha_min_score,
-                data_s=data_s,
-            )
+            job_id = await self.submit_recaptcha(**submit_kwargs)
 
+            delay = min(INITIAL_POLL_INTERVAL, poll_interval)
             while True:
                 try:
                     g_response = await self.retrieve_recaptcha(job_id)
                 except NotDecoded:
-                    await asyncio.sleep(poll_interval)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * POLL_BACKOFF_FACTOR, poll_interval)
                 except (ImageTimedOut, LimitExceeded) as e:
                     attempts_left = max_attempts - attempt - 1
                     if attempts_left > 0:
-                        next_step = f'Resubmitting job ({attempts_left} attempts left)'
+                        self.log.debug('reCAPTCHA solve job %s expired (%s). '
+                                       'Resubmitting job (%d attempts left)',
+                                       job_id, e, attempts_left)
                     else:
-                        next_step = f'Maximum attempts ({max_attempts}) reached. Aborting.'
-
-                    self.log.debug('reCAPTCHA solve job %s expired (%s). %s', job_id, e, next_step)
+                        self.log.debug('reCAPTCHA solve job %s expired (%s). '
+                                       'Maximum attempts (%d) reached. Aborting.',
+                                       job_id, e, max_attempts)
                     break
                 else:
-                    end_at = datetime.utcnow()
-                    elapsed = end_at - start_at
-                    self.log.info('Solved reCAPTCHA job %s in %ss: %s', job_id, elapsed, g_response)
+                    elapsed = time.monotonic() - start_at
+                    self.log.info('Solved reCAPTCHA job %s in %.3fs: %s', job_id, elapsed, g_response)
                     return g_response
 
         else:
@@ -78,11 +78,11 @@ class MaximumAttemptsReached(RuntimeError):
 
 
 def raise_on_error(response: httpx.Response) -> None:
-    """Raise the appropriate exception if the response contains an ERROR: ...
+    """Raise the appropriate exception if the response is an ERROR: ...
     """
-    text = response.text
-    if 'ERROR:' in text:
-        _, err_type = text.split('ERROR:', maxsplit=1)
-        err_type = err_type.strip()
+    # Checking the raw bytes avoids decoding the body of successful responses
+    raw = response.content
+    if raw.startswith(b'ERROR:'):
+        err_type = raw[6:].strip().decode('ascii', 'replace')
         exc_class = ERROR_TEXT_EXC_MAP.get(err_type, ImageTyperzError)
         raise exc_class(err_type)
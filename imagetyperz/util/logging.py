@@ -40,15 +40,14 @@ class Logger(logging.Logger):
             self._log(TRACE, msg, args, **kwargs)
 
 
-class ClassLoggingProperty:
-    """A class-level property declaration exposing a logger with the class's name
+class LoggerMixin:
+    """Exposes a logger named after the class (and its module) as `log`
+
+    The logger is assigned as a plain class attribute when each subclass is
+    declared, so accessing it costs no more than any other class attribute.
     """
-    def __init__(self, parent: Logger):
-        self.parent = parent
-
-    def __get__(self, obj, cls) -> Logger:
-        try:
-            return cls._logger
-        except AttributeError:
-            cls._logger = self.parent.subLogger(cls.__name__)
-            return cls._logger
+    log: Logger
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.log = getLogger(cls.__module__).subLogger(cls.__name__)